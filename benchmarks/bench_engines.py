@@ -0,0 +1,159 @@
+#times the per-block loop of the STBS and MBB scenes against the engines in
+#bootstrap.py over a grid of n, B, p / b and dtype, and saves the throughput and
+#peak memory of every run as json so results can be compared between versions
+#
+#    python benchmarks/bench_engines.py --n 1000 100000 --B 100 --out results.json
+import argparse
+import functools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import bootstrap
+from bootstrap import moving_block, stationary_block
+
+
+#the resampling loop of STBS.construct without the animation: draw I and L one
+#block at a time, append the block, then concatenate and cut to length
+def baseline_stationary(X, p, B):
+    samples = []
+    for _ in range(B):
+        bs_index = 0
+        blocks = []
+        while bs_index < len(X):
+            I = np.random.randint(0, len(X))
+            L = np.random.geometric(p)
+            blocks.append(stationary_block(X, I, L))
+            bs_index += L
+        samples.append(np.concatenate(blocks)[:len(X)])
+    return np.array(samples)
+
+
+#the resampling loop of MBB.construct without the animation
+def baseline_moving(X, b, B):
+    samples = []
+    for _ in range(B):
+        bs_index = 0
+        blocks = []
+        while bs_index < len(X):
+            I = np.random.randint(0, len(X))
+            block_sample = moving_block(X, I, b)
+            blocks.append(block_sample)
+            bs_index += len(block_sample)
+        samples.append(np.concatenate(blocks)[:len(X)])
+    return np.array(samples)
+
+
+#every engine is run as engine(X, B, p, b) and returns its replicates or their
+#statistics
+ENGINES = {
+    "stationary-loop": lambda X, B, p, b: baseline_stationary(X, p, B),
+    "stationary-vectorized": lambda X, B, p, b: bootstrap.stationary_bootstrap(X, p, B, rng=0),
+    "stationary-plan": lambda X, B, p, b: bootstrap.stationary_plan(len(X), p, B, rng=0),
+    "stationary-prefix-means": lambda X, B, p, b: bootstrap.streaming_moments(
+        X, functools.partial(bootstrap.stationary_plan, len(X), p), B, rng=0
+    ),
+    "stationary-parallel-means": lambda X, B, p, b: bootstrap.parallel_bootstrap(
+        X, functools.partial(bootstrap.stationary_plan, len(X), p), B, seed=0
+    ),
+    "moving-loop": lambda X, B, p, b: baseline_moving(X, b, B),
+    "moving-strided": lambda X, B, p, b: bootstrap.moving_block_bootstrap(X, b, B, rng=0),
+    "moving-strided-truncate": lambda X, B, p, b: bootstrap.moving_block_bootstrap(X, b, B, rng=0, truncate=True),
+    "moving-prefix-means": lambda X, B, p, b: bootstrap.streaming_moments(
+        X, functools.partial(bootstrap.moving_block_plan, len(X), b), B, rng=0
+    ),
+}
+
+
+#best wall time of repeat runs and the peak memory python allocated in the
+#first one. allocations made inside worker processes are not seen by
+#tracemalloc, so the peak of the parallel engines only covers the main process
+def measure(engine, X, B, p, b, repeat):
+    np.random.seed(10)
+    tracemalloc.start()
+    start = time.perf_counter()
+    engine(X, B, p, b)
+    times = [time.perf_counter() - start]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        engine(X, B, p, b)
+        times.append(time.perf_counter() - start)
+    return min(times), peak
+
+
+def version_info():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark the bootstrap engines against the scene loops")
+    parser.add_argument("--n", type=int, nargs="+", default=[1000, 100000], help="series lengths")
+    parser.add_argument("--B", type=int, nargs="+", default=[100], help="replicate counts")
+    parser.add_argument("--p", type=float, nargs="+", default=[.06, .01], help="stationary bootstrap p")
+    parser.add_argument("--b", type=int, nargs="+", default=[10, 100], help="moving blocks block size")
+    parser.add_argument("--dtype", nargs="+", default=["float64", "float32"])
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--loop-limit", type=float, default=1e7,
+                        help="skip the per-block loop baselines when n * B is larger than this")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    results = []
+    rng = np.random.default_rng(123)
+    for n in args.n:
+        series = rng.standard_normal(n)
+        for dtype in args.dtype:
+            X = series.astype(dtype)
+            for B in args.B:
+                for name in args.engines:
+                    if name.endswith("-loop") and n * B > args.loop_limit:
+                        continue
+                    #stationary engines sweep p, moving blocks engines sweep b
+                    if name.startswith("stationary"):
+                        grid = [(p, None) for p in args.p]
+                    else:
+                        grid = [(None, b) for b in args.b if b <= n]
+                    for p, b in grid:
+                        seconds, peak = measure(ENGINES[name], X, B, p, b, args.repeat)
+                        result = {
+                            "engine": name, "n": n, "B": B, "p": p, "b": b, "dtype": dtype,
+                            "seconds": seconds,
+                            "replicates_per_second": B / seconds,
+                            "points_per_second": n * B / seconds,
+                            "peak_bytes": peak,
+                        }
+                        results.append(result)
+                        print(f"{name:28s} n={n:<9d} B={B:<7d} p={p!s:6s} b={b!s:5s} {dtype:8s} "
+                              f"{seconds:9.4f}s {B / seconds:12.1f} rep/s {peak / 2**20:10.1f} MiB")
+
+    with open(args.out, "w") as f:
+        json.dump({"version": version_info(), "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
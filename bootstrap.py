@@ -0,0 +1,964 @@
+#pure numpy resampling engines behind the STBS and MBB scenes. nothing here
+#imports manim, and the process pool and shared memory modules are only imported
+#by parallel_bootstrap, so batch workers can import this module cheaply
+import functools
+import os
+import time
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+
+#opt-in timings and counters for the engines, passed in through metrics=.
+#times are seconds spent per phase ("index" for drawing blocks, "gather" for
+#materializing replicates, "statistic" for evaluating them, "render" in the
+#scenes) and counts are totals of blocks, wrapped_blocks, truncated_blocks and
+#bytes_allocated. with the default metrics=None the engines get NO_METRICS,
+#which does nothing, and skip computing the counts altogether
+class Metrics:
+    enabled = True
+
+    def __init__(self):
+        self.times = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - start
+
+    def count(self, name, value=1):
+        self.counts[name] += int(value)
+
+    def report(self):
+        return {"times": dict(self.times), "counts": dict(self.counts)}
+
+    #adds the times and counts of other, e.g. metrics collected in a worker
+    def merge(self, other):
+        for name, seconds in other.times.items():
+            self.times[name] += seconds
+        for name, value in other.counts.items():
+            self.counts[name] += value
+        return self
+
+
+class _NoMetrics:
+    enabled = False
+    _timer = nullcontext()
+
+    def timer(self, name):
+        return self._timer
+
+    def count(self, name, value=1):
+        pass
+
+
+NO_METRICS = _NoMetrics()
+
+
+#one block of the stationary bootstrap: L points of X starting at I, wrapping
+#around to the beginning of the series. this is the block the STBS scene draws
+def stationary_block(X, I, L):
+    if I + L > len(X):
+        #wrap around
+        return np.concatenate((X[I:], X[:I+L-len(X)]))
+    else:
+        return X[I:I+L]
+
+
+#one block of the moving blocks bootstrap: b points of X starting at I, cut off
+#at the end of the series. this is the block the MBB scene draws
+def moving_block(X, I, b):
+    if I + b > len(X):
+        #dont wrap around for moving blocks
+        return X[I:len(X)]
+    else:
+        return X[I:I+b]
+
+
+#B bootstrap replicates of a length n series stored as block starts and block
+#lengths instead of resampled values. the blocks of all replicates sit back to
+#back in two flat arrays and the blocks of replicate k are
+#starts[offsets[k]:offsets[k+1]]. the lengths of every replicate add up to
+#exactly n (the last block is cut short), and a block running past the end of
+#the series wraps around to the beginning like stationary_block
+class IndexPlan:
+    def __init__(self, n, starts, lengths, offsets):
+        self.n = int(n)
+        self.starts = starts
+        self.lengths = lengths
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    #plan[k] is the plan of replicate k, plan[j:k] the plan of replicates j..k-1
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            j, k, step = k.indices(len(self))
+            if step != 1:
+                raise ValueError("IndexPlan only supports contiguous slices")
+            k = max(j, k)
+        else:
+            if k < 0:
+                k += len(self)
+            if not 0 <= k < len(self):
+                raise IndexError("replicate index out of range")
+            j, k = k, k + 1
+        lo, hi = self.offsets[j], self.offsets[k]
+        return IndexPlan(self.n, self.starts[lo:hi], self.lengths[lo:hi], self.offsets[j:k + 1] - lo)
+
+    @property
+    def nbytes(self):
+        return self.starts.nbytes + self.lengths.nbytes + self.offsets.nbytes
+
+    #the (B, n) matrix of resampled indices. inside a block the index goes up by
+    #one, at the start of a new block it jumps from the (unwrapped) end of the
+    #previous block to the new start, and every index is taken mod n at the end.
+    #since each replicate has exactly n points the flat cumulative lengths are
+    #also the flat positions of the blocks in the (B, n) output
+    def indices(self, metrics=None):
+        metrics = metrics or NO_METRICS
+        B, n = len(self), self.n
+        starts = self.starts.astype(np.int64)
+        lengths = self.lengths.astype(np.int64)
+        pos = np.cumsum(lengths) - lengths
+
+        inc = np.ones(B * n, dtype=np.int64)
+        if len(starts):
+            inc[0] = starts[0]
+            inc[pos[1:]] = starts[1:] - (starts[:-1] + lengths[:-1] - 1)
+        idx = np.cumsum(inc, out=inc)
+        idx %= n
+        metrics.count("bytes_allocated", idx.nbytes)
+        return idx.reshape(B, n)
+
+    #resampled values of X for every replicate in the plan, as a (B, n) array.
+    #the same plan can be replayed against any series of length n
+    def materialize(self, X, metrics=None):
+        metrics = metrics or NO_METRICS
+        X = np.asarray(X)
+        if len(X) != self.n:
+            raise ValueError(f"plan is for a series of length {self.n}, got {len(X)}")
+        with metrics.timer("gather"):
+            out = X[self.indices(metrics)]
+        metrics.count("bytes_allocated", out.nbytes)
+        return out
+
+    def save(self, path):
+        np.savez(path, n=self.n, starts=self.starts, lengths=self.lengths, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(f["n"], f["starts"], f["lengths"], f["offsets"])
+
+    @classmethod
+    def concatenate(cls, plans):
+        plans = list(plans)
+        n = plans[0].n
+        if any(plan.n != n for plan in plans):
+            raise ValueError("plans are for series of different lengths")
+        offsets = [plans[0].offsets[:1]]
+        for plan in plans:
+            offsets.append(plan.offsets[1:] + (offsets[-1][-1] - plan.offsets[0]))
+        return cls(
+            n,
+            np.concatenate([plan.starts for plan in plans]),
+            np.concatenate([plan.lengths for plan in plans]),
+            np.concatenate(offsets),
+        )
+
+
+#smallest unsigned integer type that holds every start and length of a plan
+def _plan_dtype(n):
+    return np.min_scalar_type(n)
+
+
+#turns block starts I and block lengths L of shape (B, m) into an IndexPlan.
+#blocks that begin past the end of the sample are dropped and the last block of
+#each replicate is cut short so the replicate has exactly n points. drawn are
+#the lengths the blocks were drawn with, for counting truncated blocks
+def _plan_from_blocks(I, L, n, metrics=NO_METRICS, drawn=None):
+    pos = np.cumsum(L, axis=1) - L
+    keep = pos < n
+    dtype = _plan_dtype(n)
+    starts = I[keep].astype(dtype)
+    lengths = np.minimum(L, n - pos)[keep]
+    offsets = np.zeros(I.shape[0] + 1, dtype=np.int64)
+    np.cumsum(keep.sum(axis=1), out=offsets[1:])
+    plan = IndexPlan(n, starts, lengths.astype(dtype), offsets)
+    if metrics.enabled:
+        drawn = L if drawn is None else drawn
+        metrics.count("blocks", len(starts))
+        metrics.count("wrapped_blocks", np.count_nonzero(starts + lengths > n))
+        metrics.count("truncated_blocks", np.count_nonzero(lengths < np.broadcast_to(drawn, L.shape)[keep]))
+        metrics.count("bytes_allocated", plan.nbytes)
+    return plan
+
+
+#draws uniform starts and geometric lengths for B replicates in bulk. enough
+#blocks are drawn up front that a second round is rarely needed, and a replicate
+#never needs more than n blocks since every block has length >= 1
+def _draw_stationary(n, p, B, rng):
+    m = min(n, int(np.ceil(n * p + 4 * np.sqrt(n * p))) + 1)
+    I = rng.integers(0, n, size=(B, m))
+    L = rng.geometric(p, size=(B, m))
+    while (L.sum(axis=1) < n).any():
+        I = np.concatenate((I, rng.integers(0, n, size=(B, m))), axis=1)
+        L = np.concatenate((L, rng.geometric(p, size=(B, m))), axis=1)
+    return I, L
+
+
+#IndexPlan of B stationary bootstrap replicates of a length n series
+def stationary_plan(n, p, B, rng=None, metrics=None):
+    metrics = metrics or NO_METRICS
+    if not 0 < p <= 1:
+        raise ValueError(f"p must be in (0, 1], got {p}")
+    rng = np.random.default_rng(rng)
+    with metrics.timer("index"):
+        I, L = _draw_stationary(n, p, B, rng)
+        return _plan_from_blocks(I, L, n, metrics)
+
+
+#indices of B stationary bootstrap replicates of a length n series
+def stationary_indices(n, p, B, rng=None, metrics=None):
+    return stationary_plan(n, p, B, rng, metrics).indices(metrics)
+
+
+#B stationary bootstrap replicates of X as a (B, n) array. for an (n, k) panel
+#of aligned series the same blocks are applied to every column, which keeps the
+#cross-sectional dependence, and the result is a (B, n, k) array
+def stationary_bootstrap(X, p, B, rng=None, metrics=None):
+    X = np.asarray(X)
+    return stationary_plan(len(X), p, B, rng, metrics).materialize(X, metrics)
+
+
+#IndexPlan of B moving blocks bootstrap replicates of a length n series. with
+#truncate=True the starts are drawn from the whole series and blocks running
+#past the end are cut off, like moving_block
+def moving_block_plan(n, b, B, rng=None, truncate=False, metrics=None):
+    metrics = metrics or NO_METRICS
+    if not 1 <= b <= n:
+        raise ValueError(f"b must be in [1, {n}], got {b}")
+    rng = np.random.default_rng(rng)
+    with metrics.timer("index"):
+        if not truncate:
+            I = rng.integers(0, n - b + 1, size=(B, -(-n // b)))
+            return _plan_from_blocks(I, np.full_like(I, b), n, metrics)
+
+        #a cut off block can be as short as one point, so keep drawing until
+        #every replicate is filled
+        m = -(-n // b) + 1
+        I = rng.integers(0, n, size=(B, m))
+        while (np.minimum(b, n - I).sum(axis=1) < n).any():
+            I = np.concatenate((I, rng.integers(0, n, size=(B, m))), axis=1)
+        return _plan_from_blocks(I, np.minimum(b, n - I), n, metrics, drawn=b)
+
+
+#indices of B moving blocks bootstrap replicates of a length n series
+def moving_block_indices(n, b, B, rng=None, truncate=False, metrics=None):
+    return moving_block_plan(n, b, B, rng, truncate, metrics).indices(metrics)
+
+
+#B moving blocks bootstrap replicates of X as a (B, n) array, or (B, n, k) for
+#an (n, k) panel of aligned series. every one of the n - b + 1 overlapping
+#blocks is an entry of a read-only strided view of X, so a replicate is a single
+#gather of ceil(n/b) blocks into the output buffer
+def moving_block_bootstrap(X, b, B, rng=None, truncate=False, out=None, metrics=None):
+    metrics = metrics or NO_METRICS
+    X = np.asarray(X)
+    n = len(X)
+    if truncate:
+        plan = moving_block_plan(n, b, B, rng, truncate=True, metrics=metrics)
+        with metrics.timer("gather"):
+            out = np.take(X, plan.indices(metrics), axis=0, out=out)
+        metrics.count("bytes_allocated", out.nbytes)
+        return out
+    if not 1 <= b <= n:
+        raise ValueError(f"b must be in [1, {n}], got {b}")
+    rng = np.random.default_rng(rng)
+
+    #blocks[i] is X[i:i+b], including all columns of a panel
+    blocks = np.lib.stride_tricks.as_strided(
+        X,
+        shape=(n - b + 1, b) + X.shape[1:],
+        strides=X.strides[:1] + X.strides,
+        writeable=False,
+    )
+    k, r = divmod(n, b)
+    with metrics.timer("index"):
+        I = rng.integers(0, n - b + 1, size=(B, k + (r > 0)))
+    if out is None:
+        out = np.empty((B,) + X.shape, dtype=X.dtype)
+        metrics.count("bytes_allocated", out.nbytes)
+    #full blocks are gathered straight into the output, the last block of each
+    #replicate only contributes its first n mod b points
+    with metrics.timer("gather"):
+        full = out[:, :k * b].reshape((B, k, b) + X.shape[1:])
+        np.take(blocks, I[:, :k], axis=0, out=full, mode="clip")
+        if r:
+            out[:, k * b:] = blocks[I[:, k], :r]
+    metrics.count("blocks", I.size)
+    metrics.count("truncated_blocks", B if r else 0)
+    return out
+
+
+#prefix sums of a series and of its squares, so the sum of any block of a plan
+#is two lookups (three when it wraps around) instead of a gather of its values.
+#a statistic that is a sum of some function of each point works the same way by
+#passing that function of X. the series is centred first to keep the sums of
+#squares accurate. for an (n, k) panel every column gets its own sums. X is read
+#chunk_size points at a time, so a memory-mapped series (see open_series) is
+#never copied as a whole, and with a path the sums themselves are memory-mapped
+#.npy files path + "_S1.npy" and path + "_S2.npy" instead of two float64 arrays
+#of n + 1 points in memory
+class PrefixSums:
+    def __init__(self, X, path=None, chunk_size=1 << 20):
+        X = np.asarray(X)
+        n = self.n = len(X)
+        shape = (n + 1,) + X.shape[1:]
+        total = np.zeros(X.shape[1:])
+        for lo in range(0, n, chunk_size):
+            total += X[lo:lo + chunk_size].sum(axis=0, dtype=np.float64)
+        self.center = total / max(n, 1)
+
+        if path is None:
+            self.S1, self.S2 = np.empty(shape), np.empty(shape)
+        else:
+            self.S1 = np.lib.format.open_memmap(f"{path}_S1.npy", mode="w+", dtype=np.float64, shape=shape)
+            self.S2 = np.lib.format.open_memmap(f"{path}_S2.npy", mode="w+", dtype=np.float64, shape=shape)
+        self.S1[0] = self.S2[0] = 0
+        for lo in range(0, n, chunk_size):
+            hi = min(n, lo + chunk_size)
+            Y = X[lo:hi] - self.center
+            np.cumsum(Y, axis=0, out=self.S1[lo + 1:hi + 1])
+            self.S1[lo + 1:hi + 1] += self.S1[lo]
+            np.square(Y, out=Y)
+            np.cumsum(Y, axis=0, out=self.S2[lo + 1:hi + 1])
+            self.S2[lo + 1:hi + 1] += self.S2[lo]
+
+    #centred sum of every replicate in the plan from the prefix sums S
+    def _replicate_sums(self, S, plan):
+        if plan.n != self.n:
+            raise ValueError(f"plan is for a series of length {plan.n}, got {self.n}")
+        if len(plan) == 0:
+            return np.zeros((0,) + S.shape[1:])
+        n = self.n
+        starts = plan.starts.astype(np.int64)
+        ends = starts + plan.lengths
+        #S[0] is 0, so blocks that do not wrap add nothing for the wrapped part
+        block_sums = S[np.minimum(ends, n)] - S[starts] + S[np.maximum(ends - n, 0)]
+        return np.add.reduceat(block_sums, plan.offsets[:-1], axis=0)
+
+    def sums(self, plan):
+        return self._replicate_sums(self.S1, plan) + self.n * self.center
+
+    #mean and (biased) variance of every replicate in the plan
+    def moments(self, plan):
+        mean = self._replicate_sums(self.S1, plan) / self.n
+        var = self._replicate_sums(self.S2, plan) / self.n - mean ** 2
+        return mean + self.center, var
+
+
+#mean and variance of B replicates of X without ever materializing them. plans
+#come from plan_fn(batch, rng), e.g. functools.partial(stationary_plan, n, p),
+#and are generated batch_size at a time so memory does not grow with B. X can
+#also be a PrefixSums already built, e.g. into files for a series larger than
+#memory. to record index generation as well, give plan_fn the same metrics
+def streaming_moments(X, plan_fn, B, batch_size=1024, rng=None, metrics=None):
+    metrics = metrics or NO_METRICS
+    rng = np.random.default_rng(rng)
+    prefix = X if isinstance(X, PrefixSums) else PrefixSums(X)
+    mean = np.empty((B,) + prefix.center.shape)
+    var = np.empty((B,) + prefix.center.shape)
+    for lo in range(0, B, batch_size):
+        hi = min(B, lo + batch_size)
+        plan = plan_fn(hi - lo, rng)
+        with metrics.timer("statistic"):
+            mean[lo:hi], var[lo:hi] = prefix.moments(plan)
+    return mean, var
+
+
+#mergeable streaming quantile sketch (Karnin, Lang and Liberty's KLL) for
+#bootstrap statistics. level h holds items that each stand for 2^h statistics.
+#when the sketch is over capacity the lowest full level is sorted and every
+#other item, starting at a random offset, is promoted to the level above, so
+#memory stays O(k) however many statistics are fed in. sketches of separate
+#batches, workers or machines merge into one with the same error guarantee,
+#roughly 1.7% in rank for the default k = 200 and shrinking like 1 / k
+class QuantileSketch:
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    #lower levels get geometrically less room than the top one
+    def _capacity(self, h):
+        return max(2, int(np.ceil(self.k * (2 / 3) ** (len(self.levels) - h - 1))))
+
+    def _compress(self):
+        while sum(map(len, self.levels)) > sum(map(self._capacity, range(len(self.levels)))):
+            h = next(h for h, items in enumerate(self.levels) if len(items) >= self._capacity(h))
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[h])
+            #an odd item out stays behind
+            odd = len(items) % 2
+            promoted = items[odd + self._rng.integers(2)::2]
+            self.levels[h + 1] = np.concatenate((self.levels[h + 1], promoted))
+            self.levels[h] = items[:odd]
+
+    #adds a batch of scalar statistics. statistics of an (n, k) panel have one
+    #column per series, which would mix in one sketch, so they are rejected
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim > 1:
+            raise ValueError(f"QuantileSketch takes one statistic per replicate, got shape {values.shape}")
+        values = values.ravel()
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self.count += len(values)
+        self._compress()
+
+    #sketches only merge with the error guarantee of their k if they share it
+    def merge(self, other):
+        if other.k != self.k:
+            raise ValueError(f"cannot merge a sketch with k={other.k} into one with k={self.k}")
+        self.levels += [np.empty(0)] * (len(other.levels) - len(self.levels))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate((self.levels[h], items))
+        self.count += other.count
+        self._compress()
+        return self
+
+    #items of the sketch in order with the number of statistics each stands for
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    #approximate q quantiles of everything fed into the sketch
+    def quantile(self, q):
+        if self.count == 0:
+            raise ValueError("quantile of an empty sketch")
+        items, cum = self._weighted()
+        q = np.asarray(q, dtype=np.float64)
+        return items[np.minimum(np.searchsorted(cum, q * cum[-1]), len(items) - 1)]
+
+    #approximate fraction of the statistics that are <= x
+    def rank(self, x):
+        if self.count == 0:
+            raise ValueError("rank in an empty sketch")
+        items, cum = self._weighted()
+        i = np.searchsorted(items, x, side="right")
+        return np.where(i > 0, cum[np.maximum(i - 1, 0)], 0) / cum[-1]
+
+
+#replicates are seeded in groups, fixed whatever the batch size, so a group is
+#still drawn in bulk like any other batch of plans. a group holds up to
+#REPLICATE_GROUP replicates but no more than about GROUP_POINTS points, so the
+#plan of a group stays small for very long series. group sizes are powers of
+#two, so any batch size that is a multiple of REPLICATE_GROUP draws every group
+#only once
+REPLICATE_GROUP = 256
+GROUP_POINTS = 1 << 22
+
+
+def _group_size(n):
+    G = max(1, min(REPLICATE_GROUP, GROUP_POINTS // max(n, 1)))
+    return 1 << (G.bit_length() - 1)
+
+
+#random generator of group g of a run with the given (integer) seed. it is the
+#g-th child of SeedSequence(seed), derived directly from (seed, g), so no draws
+#of the groups before it have to be replayed
+def group_rng(seed, g):
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(g,)))
+
+
+#IndexPlan of replicates start..stop-1 of a run on a length n series. every
+#group they fall in is drawn as plan_fn(G, group_rng(seed, g)) and cut down to
+#the replicates asked for, so any single replicate or range of replicates can
+#be regenerated by redrawing at most a group at each end, e.g. to audit an
+#outlier or to split a run across machines without coordination. with metrics
+#plan_fn is called with metrics= too, which the plan functions here take, and
+#the counts cover every group drawn
+def replicate_plans(plan_fn, n, seed, start, stop, metrics=NO_METRICS):
+    if metrics.enabled:
+        plan_fn = functools.partial(plan_fn, metrics=metrics)
+    G = _group_size(n)
+    stop = max(start, stop)
+    plans = []
+    for g in range(start // G, -(-stop // G)):
+        plan = plan_fn(G, group_rng(seed, g))
+        plans.append(plan[max(start - g * G, 0):min(stop - g * G, G)])
+    if not plans:
+        return plan_fn(0, group_rng(seed, start // G))
+    if len(plans) == 1:
+        return plans[0]
+    return IndexPlan.concatenate(plans)
+
+
+#copies the arrays into shared memory blocks. returns the blocks, which the
+#caller has to close and unlink, and the (name, file, offset, shape, dtype) of
+#each array that _from_shared needs to attach to them in another process.
+#arrays memory-mapped from a file (open_series, PrefixSums with a path) are not
+#copied, the workers map the same file instead
+def _to_shared(arrays):
+    import mmap
+    from multiprocessing import shared_memory
+
+    blocks, specs = [], []
+    for a in arrays:
+        if isinstance(a, np.memmap) and isinstance(a.base, mmap.mmap) and a.flags.c_contiguous:
+            specs.append((None, a.filename, a.offset, a.shape, a.dtype.str))
+            continue
+        shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, a.dtype, buffer=shm.buf)[...] = a
+        blocks.append(shm)
+        specs.append((shm.name, None, 0, a.shape, a.dtype.str))
+    return blocks, specs
+
+
+def _from_shared(specs):
+    from multiprocessing import shared_memory
+
+    blocks, arrays = [], []
+    for name, filename, offset, shape, dtype in specs:
+        if name is None:
+            arrays.append(np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=shape))
+            continue
+        shm = shared_memory.SharedMemory(name=name)
+        blocks.append(shm)
+        arrays.append(np.ndarray(shape, dtype, buffer=shm.buf))
+    return blocks, arrays
+
+
+#what the replicates are evaluated against: the series itself, or its prefix
+#sums when the statistic is the replicate mean (X may already be a PrefixSums)
+def _bootstrap_source(X, statistic):
+    if statistic is None:
+        prefix = X if isinstance(X, PrefixSums) else PrefixSums(X)
+        return [prefix.S1, prefix.S2], prefix.center
+    return [np.asanyarray(X)], None
+
+
+def _build_source(arrays, center):
+    if center is None:
+        return arrays[0]
+    prefix = PrefixSums.__new__(PrefixSums)
+    prefix.S1, prefix.S2 = arrays
+    prefix.n = len(prefix.S1) - 1
+    prefix.center = center
+    return prefix
+
+
+#set up by _init_worker in each process of the pool
+_worker_blocks = None
+_worker_source = None
+
+
+def _init_worker(specs, center):
+    global _worker_blocks, _worker_source
+    _worker_blocks, arrays = _from_shared(specs)
+    _worker_source = _build_source(arrays, center)
+
+
+#evaluates replicates start..stop-1. source is None inside a process pool, where
+#the worker uses the series it attached to at start up
+def _run_batch(source, plan_fn, statistic, seed, start, stop, metrics=NO_METRICS):
+    if source is None:
+        source = _worker_source
+    plan = replicate_plans(plan_fn, source.n if statistic is None else len(source), seed, start, stop, metrics)
+    if statistic is None:
+        with metrics.timer("statistic"):
+            return source.sums(plan) / source.n
+    samples = plan.materialize(source, metrics)
+    with metrics.timer("statistic"):
+        return np.asarray(statistic(samples))
+
+
+#sketch of the statistics of replicates start..stop-1, so only the sketch has
+#to be sent back from a worker
+def _sketch_batch(source, plan_fn, statistic, seed, k, start, stop, metrics=NO_METRICS):
+    sketch = QuantileSketch(k, seed=start)
+    sketch.update(_run_batch(source, plan_fn, statistic, seed, start, stop, metrics))
+    return sketch
+
+
+#runs a batch with its own Metrics, which are sent back with the result
+def _metered_batch(task, start, stop):
+    metrics = Metrics()
+    return task(start, stop, metrics=metrics), metrics
+
+
+def _collect_metered(collect, metrics, results):
+    results = list(results)
+    for _, batch_metrics in results:
+        metrics.merge(batch_metrics)
+    return collect(result for result, _ in results)
+
+
+def _merge_sketches(sketch, sketches):
+    for other in sketches:
+        sketch.merge(other)
+    return sketch
+
+
+def _collect(results):
+    results = list(results)
+    return np.concatenate(results) if results else np.empty(0)
+
+
+#statistic of B replicates of X, spread over a pool of workers. plans come from
+#plan_fn(batch, rng) as in streaming_moments and statistic maps a (batch, n)
+#array of replicates to one value per replicate. the default statistic is the
+#replicate mean, computed from prefix sums without materializing replicates.
+#replicates are drawn in seeded groups (see replicate_plans), so for a given
+#seed the result is the same whatever the number of workers or the batch size,
+#and any replicate can later be rebuilt with replicate_plans. a batch_size that
+#is a multiple of REPLICATE_GROUP draws every group only once. with processes
+#the series (or its prefix sums) is put in shared memory once instead of being
+#pickled for every task, and plan_fn and statistic have to be picklable.
+#with metrics, every batch records its own Metrics in the worker (thread or
+#process) and they are added into metrics. when a QuantileSketch is passed as
+#sketch, every batch is summarised by its own sketch in the worker and they are
+#merged into sketch in batch order, which is returned instead of the statistics.
+#a sketch needs one statistic per replicate, so it does not take panels
+def parallel_bootstrap(X, plan_fn, B, statistic=None, seed=None, workers=None, batch_size=1024, executor="process", sketch=None, metrics=None):
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    metrics = metrics or NO_METRICS
+    if executor not in ("process", "thread"):
+        raise ValueError(f"executor must be 'process' or 'thread', got {executor!r}")
+    workers = workers or os.cpu_count()
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    starts = range(0, B, batch_size)
+    stops = [min(B, lo + batch_size) for lo in starts]
+    if sketch is not None and statistic is None and np.ndim(X) > 1:
+        raise ValueError("a QuantileSketch only takes one statistic per replicate, not one per column of a panel")
+    arrays, center = _bootstrap_source(X, statistic)
+    #threads share the source, processes attach to it in _init_worker
+    source = _build_source(arrays, center) if executor == "thread" else None
+    if sketch is None:
+        task = functools.partial(_run_batch, source, plan_fn, statistic, seed)
+        collect = _collect
+    else:
+        task = functools.partial(_sketch_batch, source, plan_fn, statistic, seed, sketch.k)
+        collect = functools.partial(_merge_sketches, sketch)
+    if metrics.enabled:
+        task = functools.partial(_metered_batch, task)
+        collect = functools.partial(_collect_metered, collect, metrics)
+
+    if executor == "thread":
+        with ThreadPoolExecutor(workers) as pool:
+            return collect(pool.map(task, starts, stops))
+
+    blocks, specs = _to_shared(arrays)
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(specs, center)) as pool:
+            return collect(pool.map(task, starts, stops))
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+#opens a series stored on disk without loading it. .npy files are memory-mapped
+#with their own header, anything else is read as a raw binary file of dtype
+def open_series(path, dtype=np.float64):
+    if str(path).endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+#resampled indices of points lo..hi-1 of a one replicate plan whose blocks
+#begin at positions pos, built like IndexPlan.indices from only the blocks that
+#overlap them
+def _segment_indices(plan, pos, lo, hi):
+    first = np.searchsorted(pos, lo, side="right") - 1
+    last = np.searchsorted(pos, hi)
+    starts = plan.starts[first:last].astype(np.int64)
+    lengths = plan.lengths[first:last].astype(np.int64)
+    inc = np.ones(hi - lo, dtype=np.int64)
+    inc[0] = starts[0] + lo - pos[first]
+    inc[pos[first + 1:last] - lo] = starts[1:] - (starts[:-1] + lengths[:-1] - 1)
+    idx = np.cumsum(inc, out=inc)
+    idx %= plan.n
+    return idx
+
+
+#writes B replicates of X into a memory-mapped (B, n) .npy file. replicates are
+#drawn a group at a time with replicate_plans, as in parallel_bootstrap. a group
+#of at most chunk_size points is gathered into the file in one go, longer
+#replicates chunk_size points at a time, so besides the plan of one group only
+#chunk_size indices are ever held in memory, whatever n is. X can itself be
+#memory-mapped (see open_series)
+def bootstrap_to_file(path, X, plan_fn, B, seed, chunk_size=1 << 20, metrics=None):
+    metrics = metrics or NO_METRICS
+    n = len(X)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=X.dtype, shape=(B,) + X.shape)
+    G = _group_size(n)
+    for lo in range(0, B, G):
+        hi = min(B, lo + G)
+        plan = replicate_plans(plan_fn, n, seed, lo, hi, metrics)
+        if G * n <= chunk_size:
+            with metrics.timer("gather"):
+                #mode="clip" writes straight into the file instead of
+                #buffering the output, the indices are in range anyway
+                np.take(X, plan.indices(metrics), axis=0, out=out[lo:hi], mode="clip")
+        else:
+            for k in range(len(plan)):
+                replicate = plan[k]
+                lengths = replicate.lengths.astype(np.int64)
+                pos = np.cumsum(lengths) - lengths
+                for a in range(0, n, chunk_size):
+                    b = min(n, a + chunk_size)
+                    with metrics.timer("gather"):
+                        np.take(X, _segment_indices(replicate, pos, a, b), axis=0, out=out[lo + k, a:b], mode="clip")
+        out.flush()
+    return out
+
+
+#plans on disk are a raw stream of (start, length) records. the lengths of each
+#replicate add up to exactly n, so the replicate boundaries can be recovered
+#from the records alone and chunks can simply be appended to the file
+def _record_dtype(n):
+    dtype = _plan_dtype(n)
+    return np.dtype([("start", dtype), ("length", dtype)])
+
+
+#writes the IndexPlans of B replicates of a length n series to path, a group
+#of replicates at a time. replicates are drawn with replicate_plans, so the
+#file can be replayed with load_plans against the same series
+#bootstrap_to_file would resample
+def save_plans(path, n, plan_fn, B, seed):
+    dtype = _record_dtype(n)
+    G = _group_size(n)
+    with open(path, "wb") as f:
+        for lo in range(0, B, G):
+            plan = replicate_plans(plan_fn, n, seed, lo, min(B, lo + G))
+            records = np.empty(len(plan.starts), dtype=dtype)
+            records["start"] = plan.starts
+            records["length"] = plan.lengths
+            records.tofile(f)
+
+
+#memory-maps a file written by save_plans as an IndexPlan. only the replicate
+#offsets are held in memory, found chunk_size records at a time, while the
+#starts and lengths stay on disk
+def load_plans(path, n, chunk_size=1 << 22):
+    dtype = _record_dtype(n)
+    if os.path.getsize(path) == 0:
+        #a plan of no replicates, which np.memmap cannot map
+        return IndexPlan(n, np.empty(0, dtype=dtype["start"]), np.empty(0, dtype=dtype["length"]), np.zeros(1, dtype=np.int64))
+    records = np.memmap(path, dtype=dtype, mode="r")
+    offsets = [np.zeros(1, dtype=np.int64)]
+    filled = 0
+    for lo in range(0, len(records), chunk_size):
+        ends = filled + np.cumsum(records["length"][lo:lo + chunk_size], dtype=np.int64)
+        offsets.append(np.flatnonzero(ends % n == 0) + lo + 1)
+        filled = ends[-1] % n
+    return IndexPlan(n, records["start"], records["length"], np.concatenate(offsets))
+
+
+#sample autocovariances of X at lags 0..max_lag computed with an FFT in
+#O(n log n). X is a series or an (n, k) array with one series per column. with
+#circular=True the series is wrapped around like the blocks of STBS, so lag k
+#pairs X[t] with X[(t + k) mod n]
+def autocovariance(X, max_lag=None, circular=False):
+    X = np.asarray(X, dtype=np.float64)
+    n = X.shape[0]
+    if max_lag is None:
+        max_lag = n - 1
+    Y = X - X.mean(axis=0)
+    #zero padding to at least 2n - 1 points keeps the FFT from wrapping around
+    size = n if circular else 1 << (2 * n - 1).bit_length()
+    F = np.fft.rfft(Y, n=size, axis=0)
+    return np.fft.irfft(F * F.conj(), n=size, axis=0)[:max_lag + 1] / n
+
+
+#flat-top lag window of Politis and White
+def _flat_top(s):
+    s = np.abs(s)
+    return np.clip(2 * (1 - s), 0, 1)
+
+
+#automatic block length selection of Politis and White (2004) with the
+#correction of Patton, Politis and White (2009). returns the block size b for
+#the moving blocks bootstrap (the circular block estimate, which MBB shares) and
+#the p = 1 / expected block length for the stationary bootstrap. for an (n, k)
+#array both are computed for every column at once. a column with no dependence
+#to estimate, e.g. a constant series, gets b = 1 and p = 1, and so does every
+#column of a series too short to have kn lags to test
+def optimal_block_length(X):
+    X = np.asarray(X, dtype=np.float64)
+    n = X.shape[0]
+    kn = max(5, int(np.ceil(np.sqrt(np.log10(max(n, 1))))))
+    if n <= kn:
+        if X.ndim == 1:
+            return 1, 1.0
+        k = int(np.prod(X.shape[1:]))
+        return np.ones(k, dtype=int), np.ones(k)
+    m_max = int(np.ceil(np.sqrt(n))) + kn
+    b_max = np.ceil(min(3 * np.sqrt(n), n / 3))
+
+    acv = autocovariance(X, min(m_max, n - 1))
+    acv = acv.reshape(len(acv), -1)
+    m_max = len(acv) - 1
+    #centring leaves rounding noise of a few eps * |X| in a constant column
+    scale = np.abs(X).max(axis=0).reshape(-1)
+    constant = acv[0] <= (16 * np.finfo(np.float64).eps * scale) ** 2
+
+    #m_hat is the smallest lag after which kn autocorrelations in a row are
+    #insignificant, and M = 2 m_hat is the bandwidth of the flat-top window
+    insig = np.abs(acv[1:]) < 2 * np.sqrt(np.log10(n) / n) * np.abs(acv[0])
+    runs = np.cumsum(np.vstack((np.zeros((1, insig.shape[1]), dtype=int), insig)), axis=0)
+    runs = runs[kn:] - runs[:-kn] == kn
+    M = np.where(runs.any(axis=0), 2 * np.maximum(runs.argmax(axis=0), 1), m_max)
+    M = np.minimum(M, m_max)
+
+    k = np.arange(m_max + 1)[:, None]
+    lam = _flat_top(k / M)
+    G = 2 * (lam * k * acv).sum(axis=0)
+    g = 2 * (lam * acv).sum(axis=0) - acv[0]
+    valid = ~constant & (g != 0)
+    ratio = np.divide(G ** 2, g ** 2, out=np.zeros_like(G), where=valid)
+    b_sb = ratio ** (1 / 3) * n ** (1 / 3)
+    b_cb = (1.5 * ratio) ** (1 / 3) * n ** (1 / 3)
+
+    b = np.where(valid, np.clip(np.ceil(b_cb), 1, b_max), 1).astype(int)
+    p = np.where(valid, 1 / np.clip(b_sb, 1, b_max), 1.0)
+    if X.ndim == 1:
+        return int(b[0]), float(p[0])
+    return b, p
+
+
+#exact bootstrap variance of the sample mean under the stationary bootstrap,
+#with no resampling. two points t apart in a replicate come from the same block
+#with probability (1 - p)^t, and then they are X[i] and X[(i + t) mod n], so
+#the variance is a weighted sum of the circular autocovariances:
+#    (n c(0) + 2 sum_t (n - t) (1 - p)^t c(t)) / n^2
+#which costs one FFT, O(n log n), instead of B n for Monte Carlo
+def stationary_mean_variance(X, p):
+    if not 0 < p <= 1:
+        raise ValueError(f"p must be in (0, 1], got {p}")
+    c = autocovariance(X, circular=True)
+    n = len(c)
+    t = np.arange(1, n)
+    w = (n - t) * (1 - p) ** t
+    return (n * c[0] + 2 * np.tensordot(w, c[1:], axes=1)) / n ** 2
+
+
+#exact bootstrap variance of the sample mean under the moving blocks bootstrap
+#(truncate=False). the n // b full blocks and the final block of n % b points
+#are independent, and each is a uniformly chosen window of the series, so the
+#variance is the spread of the window sums, read off prefix sums in O(n). the
+#blocks do not wrap around, so unlike the stationary case this is not a function
+#of the autocovariances alone
+def moving_block_mean_variance(X, b):
+    X = np.asarray(X, dtype=np.float64)
+    n = len(X)
+    if not 1 <= b <= n:
+        raise ValueError(f"b must be in [1, {n}], got {b}")
+    S = PrefixSums(X).S1
+    starts = np.arange(n - b + 1)
+
+    def window_variance(L):
+        sums = S[starts + L] - S[starts]
+        return sums.var(axis=0)
+
+    k, r = divmod(n, b)
+    total = k * window_variance(b)
+    if r:
+        total = total + window_variance(r)
+    return total / n ** 2
+
+
+#standard error of the replicate statistics and its Monte Carlo error from the
+#power sums sums[j - 1] = sum (x - shift)^j, j = 1..4, over B statistics, which
+#can be kept up to date batch by batch. shift is any value close to the mean
+#and only keeps the sums accurate. the error of a sample standard deviation s is
+#sqrt(m4 - s^4) / (2 s sqrt(B)), m4 being the fourth central moment, which does
+#not assume normal statistics. statistics with no spread at all, e.g. of a
+#constant series, have no error
+def _se_error(B, sums):
+    mu, r2, r3, r4 = (S / B for S in sums)
+    se = np.sqrt(np.maximum(r2 - mu ** 2, 0) * B / (B - 1))
+    m4 = r4 - 4 * mu * r3 + 6 * mu ** 2 * r2 - 3 * mu ** 4
+    spread = np.sqrt(np.maximum(m4 - se ** 4, 0))
+    error = np.divide(spread, 2 * se * np.sqrt(B), out=np.zeros_like(spread), where=se > 0)
+    return se, error[()]
+
+
+#quantiles of the replicate statistics and their Monte Carlo errors. the error
+#of the q quantile is the spread of the order statistics bounding a 95%
+#binomial interval around rank q B, divided by 2 * 1.96, so no density
+#estimate is needed
+def _quantile_error(stats, quantiles):
+    B = len(stats)
+    q = np.asarray(quantiles, dtype=np.float64)
+    half = 1.96 * np.sqrt(B * q * (1 - q))
+    lo = np.clip(np.floor(q * B - half), 0, B - 1).astype(int)
+    hi = np.clip(np.ceil(q * B + half), 0, B - 1).astype(int)
+    ordered = np.sort(stats, axis=0)
+    return np.quantile(stats, q, axis=0), (ordered[hi] - ordered[lo]) / (2 * 1.96)
+
+
+AdaptiveResult = namedtuple("AdaptiveResult", ["estimate", "mc_error", "replicates", "converged", "statistics"])
+
+
+#bootstraps X in batches until the Monte Carlo error of the result is at most
+#tol, instead of guessing B in advance. the result is the standard error of the
+#statistic, or its quantiles when quantiles is given, and every entry has to
+#meet tol. plans come from plan_fn(batch, rng) and statistic works as in
+#parallel_bootstrap (replicate means from prefix sums by default). replicate k
+#is drawn with replicate_plans, so the replicates used are the first ones of a
+#fixed-size run with the same seed. the standard error is checked after every
+#batch from running power sums, while the quantiles need a sort of all the
+#statistics so far and are only checked once B has grown by a quarter since
+#the last check. AdaptiveResult.replicates is the number of replicates actually
+#used
+def adaptive_bootstrap(X, plan_fn, tol, statistic=None, quantiles=None, seed=None, batch_size=1024, max_replicates=10**6, metrics=None):
+    metrics = metrics or NO_METRICS
+    if max_replicates < 2:
+        raise ValueError(f"max_replicates must be at least 2, got {max_replicates}")
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    if statistic is None:
+        source = X if isinstance(X, PrefixSums) else PrefixSums(X)
+    else:
+        source = np.asarray(X)
+    stats = None
+    B = 0
+    check = 2
+    while B < max_replicates:
+        stop = min(max_replicates, B + batch_size)
+        batch = _run_batch(source, plan_fn, statistic, seed, B, stop, metrics)
+        if stats is None:
+            stats = np.empty((max_replicates,) + batch.shape[1:])
+            shift = batch.mean(axis=0)
+            sums = [0] * 4
+        stats[B:stop] = batch
+        B = stop
+        if quantiles is None:
+            d = batch - shift
+            for j in range(4):
+                sums[j] = sums[j] + (d ** (j + 1)).sum(axis=0)
+        if B < check and B < max_replicates:
+            continue
+        if quantiles is None:
+            estimate, error = _se_error(B, sums)
+        else:
+            estimate, error = _quantile_error(stats[:B], quantiles)
+            check = B + B // 4
+        if np.all(error <= tol):
+            return AdaptiveResult(estimate, error, B, True, stats[:B])
+    return AdaptiveResult(estimate, error, B, False, stats[:B])
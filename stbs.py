@@ -1,26 +1,163 @@
 import numpy as np
 from manim import *
 
-class STBS(Scene):
+from bootstrap import NO_METRICS, Metrics, moving_block, stationary_block
+
+
+#min/max decimation of a line to about budget points. the points are split into
+#budget / 2 buckets and each bucket keeps its lowest and highest point, in
+#order, so spikes survive however long the series is. a budget below 2 would
+#leave no buckets at all
+def decimate(x, y, budget):
+    if budget < 2:
+        raise ValueError(f"decimate needs a budget of at least 2 points, got {budget}")
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) <= budget:
+        return x, y
+    edges = np.linspace(0, len(y), budget // 2 + 1).astype(int)
+    keep = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        keep += sorted({lo + y[lo:hi].argmin(), lo + y[lo:hi].argmax()})
+    return x[keep], y[keep]
+
+
+#Tex objects by their string and keyword arguments. the numbers and block
+#labels repeat from block to block, so each one is only compiled by LaTeX once
+#and later uses get a copy
+_tex_cache = {}
+
+
+def cached_tex(text, **kwargs):
+    key = (text, tuple(sorted(kwargs.items())))
+    if key not in _tex_cache:
+        _tex_cache[key] = Tex(text, **kwargs)
+    return _tex_cache[key].copy()
+
+
+#animations that draw a plot made by plot_series, with or without vertex dots
+def create_plot(plot):
+    dots = plot.submob_dict.get("vertex_dots", VGroup())
+    return [Create(plot["line_graph"]), *[Create(dot) for dot in dots]]
+
+
+#base scene for the bootstrap animations.
+#
+#RENDER_POINTS turns on decimated rendering for long series: any line with more
+#points than that is cut down with decimate and drawn without vertex dots, and
+#only the first ANIMATED_BLOCKS blocks are animated one by one while the rest
+#of the sample is drawn in one go. the resampling always runs on the full data.
+#
+#PREVIEW is a fast preview mode: waits are skipped, the random draws jump
+#straight to their values, and all the animations of one block are played as a
+#single Succession instead of one play call each.
+#
+#SEED seeds the generated series and RESAMPLE_SEED the block draws. these,
+#LENGTH and the block parameters of each scene are class attributes so a
+#configuration is just a subclass, see sweep.py.
+#
+#with METRICS set, every play and wait call is timed under "render" and the
+#resampling adds its own timings and block counters to self.metrics, which is
+#logged when the scene is done
+class BootstrapScene(Scene):
+    SEED = 123
+    RESAMPLE_SEED = 10
+    LENGTH = 100
+    RENDER_POINTS = None
+    ANIMATED_BLOCKS = None
+    PREVIEW = False
+    METRICS = False
+
+    def setup(self):
+        if self.RENDER_POINTS is not None and self.RENDER_POINTS < 2:
+            raise ValueError(f"RENDER_POINTS must be at least 2, got {self.RENDER_POINTS}")
+        self.metrics = Metrics() if self.METRICS else NO_METRICS
+        self.batch = None
+
+    def play(self, *args, **kwargs):
+        if self.batch is not None:
+            self.batch.append(AnimationGroup(*args, **kwargs))
+            return
+        with self.metrics.timer("render"):
+            super().play(*args, **kwargs)
+
+    def wait(self, *args, **kwargs):
+        if self.PREVIEW:
+            return
+        with self.metrics.timer("render"):
+            super().wait(*args, **kwargs)
+
+    #in preview mode, collects the play calls of a block until flush_batch
+    def begin_batch(self):
+        if self.PREVIEW:
+            self.batch = []
+
+    def flush_batch(self):
+        batch, self.batch = self.batch, None
+        if batch:
+            self.play(Succession(*batch))
+
+    #draws a new random value into mobj with func, animated unless previewing.
+    #a preview still runs the updaters so mobjects following mobj move with it
+    def randomize(self, mobj, func):
+        if self.PREVIEW:
+            func(mobj)
+            self.update_mobjects(0)
+        else:
+            self.play(UpdateFromFunc(mobj, func))
+
+    def tear_down(self):
+        if self.metrics.enabled:
+            logger.info(f"{type(self).__name__} metrics: {self.metrics.report()}")
+
+    #plot_line_graph on the given axes, decimated to RENDER_POINTS if it is set
+    def plot_series(self, axes, x_values, y_values, line_color, vertex_dot_radius):
+        if self.RENDER_POINTS is not None and len(y_values) > self.RENDER_POINTS:
+            x_values, y_values = decimate(x_values, y_values, self.RENDER_POINTS)
+            return axes.plot_line_graph(x_values=x_values, y_values=y_values, line_color=line_color, add_vertex_dots=False)
+        return axes.plot_line_graph(
+            x_values=x_values,
+            y_values=y_values,
+            line_color=line_color,
+            vertex_dot_radius=vertex_dot_radius,
+        )
+
+    #True once ANIMATED_BLOCKS blocks have been animated
+    def animation_done(self, i):
+        return self.ANIMATED_BLOCKS is not None and i >= self.ANIMATED_BLOCKS
+
+
+class STBS(BootstrapScene):
+    PROB = .06
+
+    #the block starting at I of length L, recorded in the metrics
+    def gen_block(self, I, L):
+        with self.metrics.timer("gather"):
+            block_sample = stationary_block(self.data, I, L)
+        self.metrics.count("blocks")
+        if I + L > len(self.data):
+            self.metrics.count("wrapped_blocks")
+            self.metrics.count("bytes_allocated", block_sample.nbytes)
+        return block_sample
+
     def construct(self):
 
         #generating data
-        np.random.seed(123)
-        self.data = np.random.randn(100)
+        np.random.seed(self.SEED)
+        self.data = np.random.randn(self.LENGTH)
         self.t = range(len(self.data))
-        self.LENGTH = len(self.data)
-        self.PROB = .06
 
         #generates the first axes at the beginning
         axes = Axes(
-            x_range=[0, 105],
+            x_range=[0, self.LENGTH*1.05],
             y_range=[-5, 5],
             axis_config={"include_ticks": False},
             tips=True,
         )
 
         #initially plots the original data
-        series_plot = axes.plot_line_graph(
+        series_plot = self.plot_series(
+            axes,
             x_values=self.t,
             y_values=self.data, 
             line_color=BLUE,
@@ -41,7 +178,7 @@ class STBS(Scene):
         p_txt = Tex(f"p =").next_to(L_txt, DOWN)
         text_grp_corner = VGroup(I_txt, L_txt, p_txt).to_corner(UR).shift(LEFT*1.6).shift(DOWN*.7)
 
-        initial_text = Tex("$X_1, \ldots, X_{100}$").next_to(orig_series_grp, DOWN, buff=.1)
+        initial_text = Tex(f"$X_1, \ldots, X_{{{self.LENGTH}}}$").next_to(orig_series_grp, DOWN, buff=.1)
         
         
         ######################################## INITIAL ANIMATION ########################################
@@ -54,7 +191,7 @@ class STBS(Scene):
         self.play(Transform(text_grp, text_grp_corner))
 
         self.play(Create(axes))
-        self.play(Create(series_plot["line_graph"]), *[Create(dot) for dot in series_plot['vertex_dots']], Create(initial_text))
+        self.play(*create_plot(series_plot), Create(initial_text))
         #self.play(Create(series_plot["line_graph"]), Create(series_plot['vertex_dots'][20]))
         self.wait(1)
         self.play(Transform(orig_series_grp, small_series), FadeOut(initial_text))
@@ -69,7 +206,7 @@ class STBS(Scene):
         P_val = self.PROB
         P_val_obj = DecimalNumber(P_val).next_to(p_txt, RIGHT, buff=0.2)
         #P_val_obj.add_updater(lambda m: m.set_value(P_val))
-        np.random.seed(10)
+        np.random.seed(self.RESAMPLE_SEED)
         def randomize_I(I_val_obj):
             I = np.random.randint(0, len(self.data))
             I_val_obj.set_value(I)
@@ -81,20 +218,12 @@ class STBS(Scene):
 
         #generates the axis for the bootstrap sample
         bootstrap_axes = Axes(
-            x_range=[0, 105],
+            x_range=[0, self.LENGTH*1.05],
             y_range=[-4, 4],
             axis_config={"include_ticks": False},
             tips=True,
         ).scale(0.6).to_corner(DL).shift(RIGHT*0.5)
 
-        #function for generating a block from the original data
-        def gen_block(X, I, L):
-            if I + L > len(X):
-                #wrap around
-                return np.concatenate((X[I:], X[:I+L-len(X)]))
-            else:
-                return X[I:I+L]
-        
         #animates the bootstrap axis and sets initial params for the loop
         dot = Dot(color=ORANGE).move_to(small_series[0].c2p(I_val_obj.get_value(), -3.5))
         dot.add_updater(lambda m: m.move_to(small_series[0].c2p(I_val_obj.get_value(), -3.5)))
@@ -109,38 +238,41 @@ class STBS(Scene):
         block_plots = VGroup()
         i = 0
         #loops until the bootstrap sample is complete
-        sum = 0 ### testing purposes
-        while bs_index < self.LENGTH:
+        while bs_index < self.LENGTH and not self.animation_done(i):
+            self.begin_batch()
             #updates the values of I, L, and p
-            self.play(UpdateFromFunc(I_val_obj, randomize_I))
+            self.randomize(I_val_obj, randomize_I)
             I = I_val_obj.get_value()
             self.wait(.5)
-            dot_label = Tex(str(I), font_size = 30).next_to(dot, DOWN, buff=0.2)
+            dot_label = cached_tex(str(I), font_size = 30).next_to(dot, DOWN, buff=0.2)
             
   
             #creates the block label
-            block_label = Tex(f"$B_{{{I}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
-            block_label_mutated = Tex(f"$B_{{{i+1}}}^*$").next_to(bootstrap_axes, RIGHT, buff=2.5)
+            block_label = cached_tex(f"$B_{{{I}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
+            block_label_mutated = cached_tex(f"$B_{{{i+1}}}^*$").next_to(bootstrap_axes, RIGHT, buff=2.5)
             self.play(Create(block_label), Create(dot_label))
             self.wait(.4)
-            self.play(UpdateFromFunc(L_val_obj, randomize_L))
+            self.randomize(L_val_obj, randomize_L)
             L = L_val_obj.get_value()
             #logic for wrapping around the data
             if I + L > len(self.data):
                 #wrap around
-                block_plot_origin_end = small_series[0].plot_line_graph(
+                block_plot_origin_end = self.plot_series(
+                    small_series[0],
                     x_values=range(I, len(self.data)),
                     y_values=self.data[I:], 
                     line_color=RED,
                     vertex_dot_radius=0.05,
                 )
-                block_plot_origin_begin = small_series[0].plot_line_graph(
+                block_plot_origin_begin = self.plot_series(
+                    small_series[0],
                     x_values=range(I+L-len(self.data)),
                     y_values=self.data[:I+L-len(self.data)], 
                     line_color=RED,
                     vertex_dot_radius=0.05,
                 )
-                block_plot_origin_begin_shifted = small_series[0].plot_line_graph(
+                block_plot_origin_begin_shifted = self.plot_series(
+                    small_series[0],
                     x_values=range(len(self.data), I+L),
                     y_values=self.data[:I+L-len(self.data)], 
                     line_color=RED,
@@ -153,37 +285,37 @@ class STBS(Scene):
                 line = Line(dot, small_series[0].c2p(len(self.data), -3.5), color=ORANGE, buff=0)
                 arrow = Arrow(small_series[0].c2p(0, -3.5), small_series[0].c2p(I+L-len(self.data), -3.5), color=ORANGE, buff=0)
                 arrow_shifted = arrow.copy().next_to(line, RIGHT, buff=0)
-                arrow_label = Tex(str(L), font_size=30).next_to(arrow, RIGHT, buff=0.15)
+                arrow_label = cached_tex(str(L), font_size=30).next_to(arrow, RIGHT, buff=0.15)
                 arrow_label_shifted = arrow_label.copy().next_to(arrow_shifted, RIGHT, buff=0.15)
-                block_label_with_length = Tex(f"$B_{{{I},{L}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
+                block_label_with_length = cached_tex(f"$B_{{{I},{L}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
                 arrow_stuff = VGroup(arrow_shifted, arrow_label_shifted, line)
-                self.play(Create(block_plot_origin_end["line_graph"]), *[Create(dot) for dot in block_plot_origin_end['vertex_dots']], Create(line))
+                self.play(*create_plot(block_plot_origin_end), Create(line))
                 self.wait(.1)
-                self.play(Create(block_plot_origin_begin["line_graph"]), *[Create(dot) for dot in block_plot_origin_begin['vertex_dots']], Create(arrow), Create(arrow_label), ReplacementTransform(block_label, block_label_with_length))
+                self.play(*create_plot(block_plot_origin_begin), Create(arrow), Create(arrow_label), ReplacementTransform(block_label, block_label_with_length))
                 self.play(ReplacementTransform(block_plot_origin_begin, block_plot_origin_begin_shifted), ReplacementTransform(arrow, arrow_shifted), ReplacementTransform(arrow_label, arrow_label_shifted))
             else:
-                block_plot_origin_end = small_series[0].plot_line_graph(
+                block_plot_origin_end = self.plot_series(
+                    small_series[0],
                     x_values=range(I, I+L),
                     y_values=self.data[I:I+L], 
                     line_color=RED,
                     vertex_dot_radius=0.05,
                 )
                 arrow = Arrow(small_series[0].c2p(I, -3.5), small_series[0].c2p(I+L, -3.5), color=ORANGE, buff=0)
-                arrow_label = Tex(str(L), font_size=30).next_to(arrow, RIGHT, buff=0.15)
-                block_label_with_length = Tex(f"$B_{{{I},{L}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
+                arrow_label = cached_tex(str(L), font_size=30).next_to(arrow, RIGHT, buff=0.15)
+                block_label_with_length = cached_tex(f"$B_{{{I},{L}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
                 arrow_stuff = VGroup(arrow, arrow_label)
-                self.play(Create(block_plot_origin_end["line_graph"]), *[Create(dot) for dot in block_plot_origin_end['vertex_dots']], Create(arrow), Create(arrow_label), ReplacementTransform(block_label, block_label_with_length))
+                self.play(*create_plot(block_plot_origin_end), Create(arrow), Create(arrow_label), ReplacementTransform(block_label, block_label_with_length))
                 fin_block = block_plot_origin_end
                 block_plot_origin_begin_shifted = None #this is just to avoid an error later
 
             #get the actual data for the bootstrap block and add to the blocks array    
-            block_sample = gen_block(self.data, I, L)
-            sum += len(block_sample)
-            print(sum) ### testing purposes
+            block_sample = self.gen_block(I, L)
             blocks.append(block_sample)
 
             #make a plot figure for the individual block
-            block_plot = bootstrap_axes.plot_line_graph(
+            block_plot = self.plot_series(
+                bootstrap_axes,
                 x_values=range(bs_index, bs_index+L),
                 y_values=list(block_sample), 
                 line_color=RED,
@@ -206,17 +338,40 @@ class STBS(Scene):
                     FadeOut(fin_block),
                     FadeOut(block_label_mutated), 
                 )
+            self.flush_batch()
             bs_index += L
             i += 1
 
+        #past ANIMATED_BLOCKS the rest of the sample is resampled without
+        #animating each block and drawn as one line below
+        rest_index = bs_index
+        while bs_index < self.LENGTH:
+            I = np.random.randint(0, len(self.data))
+            L = np.random.geometric(self.PROB)
+            blocks.append(self.gen_block(I, L))
+            bs_index += L
+
         #combine the arrays in blocks into one numpy array
-        bootstrap_sample = np.concatenate(blocks)
-        print("=====================================") ### testing purposes
-        print(len(bootstrap_sample)) ### testing purposes
+        with self.metrics.timer("gather"):
+            bootstrap_sample = np.concatenate(blocks)
+        self.metrics.count("bytes_allocated", bootstrap_sample.nbytes)
+        #the last block is cut off if it runs past the length of the sample
+        if len(bootstrap_sample) > self.LENGTH:
+            self.metrics.count("truncated_blocks")
         bootstrap_sample = bootstrap_sample[:self.LENGTH]
-        print(len(bootstrap_sample)) ### testing purposes
+        if rest_index < self.LENGTH:
+            rest_plot = self.plot_series(
+                bootstrap_axes,
+                x_values=range(rest_index, self.LENGTH),
+                y_values=bootstrap_sample[rest_index:],
+                line_color=RED,
+                vertex_dot_radius=0.05,
+            )
+            block_plots.add(rest_plot)
+            self.play(*create_plot(rest_plot))
         #plot the final bootstrap sample
-        fin_bootstrap_plot = bootstrap_axes.plot_line_graph(
+        fin_bootstrap_plot = self.plot_series(
+            bootstrap_axes,
             x_values=range(self.LENGTH),
             y_values=bootstrap_sample, 
             line_color=GREEN,
@@ -224,11 +379,11 @@ class STBS(Scene):
         )
         
         final_plot = VGroup(bootstrap_axes, fin_bootstrap_plot)
-        self.play(Create(fin_bootstrap_plot["line_graph"]), *[Create(dot) for dot in fin_bootstrap_plot['vertex_dots']])
+        self.play(*create_plot(fin_bootstrap_plot))
         self.play(FadeOut(block_plots))
 
         #make final text objects
-        final_text = Tex("$\Rightarrow X^*_1, \ldots, X^*_{100}$").next_to(bootstrap_axes, RIGHT, buff=2)
+        final_text = Tex(f"$\Rightarrow X^*_1, \ldots, X^*_{{{self.LENGTH}}}$").next_to(bootstrap_axes, RIGHT, buff=2)
         self.play(Create(final_text))
 
         #center the final plot on the screen and scale it up
@@ -255,26 +410,36 @@ class STBS(Scene):
         
 
 
-class MBB(Scene):
+class MBB(BootstrapScene):
+    b = 10
+
+    #the block starting at I, recorded in the metrics
+    def gen_block(self, I):
+        with self.metrics.timer("gather"):
+            block_sample = moving_block(self.data, I, self.b)
+        self.metrics.count("blocks")
+        if len(block_sample) < self.b:
+            self.metrics.count("truncated_blocks")
+        return block_sample
+
     def construct(self):
 
         #generating data
-        np.random.seed(123)
-        self.data = np.random.randn(100)
+        np.random.seed(self.SEED)
+        self.data = np.random.randn(self.LENGTH)
         self.t = range(len(self.data))
-        self.LENGTH = len(self.data)
-        self.b = 10
 
         #generates the first axes at the beginning
         axes = Axes(
-            x_range=[0, 105],
+            x_range=[0, self.LENGTH*1.05],
             y_range=[-5, 5],
             axis_config={"include_ticks": False},
             tips=True,
         )
 
         #initially plots the original data
-        series_plot = axes.plot_line_graph(
+        series_plot = self.plot_series(
+            axes,
             x_values=self.t,
             y_values=self.data, 
             line_color=BLUE,
@@ -295,7 +460,7 @@ class MBB(Scene):
         b_txt = Tex(f"b =").next_to(I_txt, DOWN)
         text_grp_corner = VGroup(I_txt, b_txt).to_corner(UR).shift(LEFT*1.6).shift(DOWN*.7)
 
-        initial_text = Tex("$X_1, \ldots, X_{100}$").next_to(orig_series_grp, DOWN, buff=.1)
+        initial_text = Tex(f"$X_1, \ldots, X_{{{self.LENGTH}}}$").next_to(orig_series_grp, DOWN, buff=.1)
         
         ######################################## INITIAL ANIMATION ########################################
         title = Title("Moving Blocks Bootstrap", include_underline=False).to_edge(UP)
@@ -307,7 +472,7 @@ class MBB(Scene):
         self.play(Transform(text_grp, text_grp_corner))
 
         self.play(Create(axes))
-        self.play(Create(series_plot["line_graph"]), *[Create(dot) for dot in series_plot['vertex_dots']], Create(initial_text))
+        self.play(*create_plot(series_plot), Create(initial_text))
         #self.play(Create(series_plot["line_graph"]), Create(series_plot['vertex_dots'][20]))
         self.wait(1)
         self.play(Transform(orig_series_grp, small_series), FadeOut(initial_text))
@@ -317,8 +482,8 @@ class MBB(Scene):
 
         #this section creates the integer and decimal number objects for I, L, and p
         I_val_obj = Integer(0).next_to(I_txt, RIGHT, buff=0.2)
-        b_val_obj = Integer(10).next_to(b_txt, RIGHT, buff=0.2)
-        np.random.seed(10)
+        b_val_obj = Integer(self.b).next_to(b_txt, RIGHT, buff=0.2)
+        np.random.seed(self.RESAMPLE_SEED)
         def randomize_I(I_val_obj):
             I = np.random.randint(0, len(self.data))
             I_val_obj.set_value(I)
@@ -327,21 +492,13 @@ class MBB(Scene):
 
         #generates the axis for the bootstrap sample
         bootstrap_axes = Axes(
-            x_range=[0, 105],
+            x_range=[0, self.LENGTH*1.05],
             y_range=[-4, 4],
             axis_config={"include_ticks": False},
             tips=True,
         ).scale(0.6).to_corner(DL).shift(RIGHT*0.5)
 
         
-        #function for generating a block from the original data
-        def gen_block(X, I, L):
-            if I + L > len(X):
-                #dont wrap around for moving blocks
-                return X[I:len(X)]
-            else:
-                return X[I:I+L]
-        
         #animates the bootstrap axis and sets initial params for the loop
 
         dot = Dot(color=ORANGE).move_to(small_series[0].c2p(I_val_obj.get_value(), -3.5))
@@ -357,22 +514,23 @@ class MBB(Scene):
         block_plots = VGroup()
         i = 0
         #loops until the bootstrap sample is complete
-        sum = 0 ### testing purposes
-        while bs_index < self.LENGTH:
+        while bs_index < self.LENGTH and not self.animation_done(i):
+            self.begin_batch()
             #updates the values of I, L, and p
-            self.play(UpdateFromFunc(I_val_obj, randomize_I))
+            self.randomize(I_val_obj, randomize_I)
             I = I_val_obj.get_value()
             self.wait(1)
-            dot_label = Tex(str(I), font_size = 30).next_to(dot, DOWN, buff=0.2)
+            dot_label = cached_tex(str(I), font_size = 30).next_to(dot, DOWN, buff=0.2)
             #creates the block label
-            block_label = Tex(f"$B_{{{I}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
-            block_label_mutated = Tex(f"$B_{{{i+1}}}^*$").next_to(bootstrap_axes, RIGHT, buff=2.5)
+            block_label = cached_tex(f"$B_{{{I}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
+            block_label_mutated = cached_tex(f"$B_{{{i+1}}}^*$").next_to(bootstrap_axes, RIGHT, buff=2.5)
             self.play(Create(block_label), Create(dot_label))
 
             #logic for wrapping around the data
             if I + self.b > len(self.data):
                 #cut off the end of the data
-                block_plot_origin_end = small_series[0].plot_line_graph(
+                block_plot_origin_end = self.plot_series(
+                    small_series[0],
                     x_values=range(I, len(self.data)),
                     y_values=self.data[I:], 
                     line_color=RED,
@@ -382,11 +540,12 @@ class MBB(Scene):
                 fin_block = block_plot_origin_end
                 #now making the line for the length of the block
                 arrow = Arrow(dot, small_series[0].c2p(len(self.data), -3.5), color=ORANGE, buff=0)
-                arrow_label = Tex(str(len(self.data - I)), font_size=30).next_to(arrow, RIGHT, buff=0.15)
-                block_label_with_length = Tex(f"$B_{{{I},{len(self.data)-I}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
-                self.play(Create(block_plot_origin_end["line_graph"]), *[Create(dot) for dot in block_plot_origin_end['vertex_dots']], Create(arrow), Create(arrow_label), ReplacementTransform(block_label, block_label_with_length))
+                arrow_label = cached_tex(str(len(self.data) - I), font_size=30).next_to(arrow, RIGHT, buff=0.15)
+                block_label_with_length = cached_tex(f"$B_{{{I},{len(self.data)-I}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
+                self.play(*create_plot(block_plot_origin_end), Create(arrow), Create(arrow_label), ReplacementTransform(block_label, block_label_with_length))
             else:
-                block_plot_origin_end = small_series[0].plot_line_graph(
+                block_plot_origin_end = self.plot_series(
+                    small_series[0],
                     x_values=range(I, I+self.b),
                     y_values=self.data[I:I+self.b], 
                     line_color=RED,
@@ -395,19 +554,18 @@ class MBB(Scene):
 
                 #now making the line for the length of the block
                 arrow = Arrow(dot, small_series[0].c2p(I+self.b, -3.5), color=ORANGE, buff=0)
-                arrow_label = Tex(str(self.b), font_size=30).next_to(arrow, RIGHT, buff=0.15)
-                block_label_with_length = Tex(f"$B_{{{I},{self.b}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
-                self.play(Create(block_plot_origin_end["line_graph"]), *[Create(dot) for dot in block_plot_origin_end['vertex_dots']], Create(arrow), Create(arrow_label), ReplacementTransform(block_label, block_label_with_length))
+                arrow_label = cached_tex(str(self.b), font_size=30).next_to(arrow, RIGHT, buff=0.15)
+                block_label_with_length = cached_tex(f"$B_{{{I},{self.b}}}$").next_to(bootstrap_axes, RIGHT, buff=2.5)
+                self.play(*create_plot(block_plot_origin_end), Create(arrow), Create(arrow_label), ReplacementTransform(block_label, block_label_with_length))
                 fin_block = block_plot_origin_end
 
             #get the actual data for the bootstrap block and add to the blocks array    
-            block_sample = gen_block(self.data, I, self.b)
-            sum += len(block_sample)
-            print(sum) ### testing purposes
+            block_sample = self.gen_block(I)
             blocks.append(block_sample)
 
             #make a plot figure for the individual block
-            block_plot = bootstrap_axes.plot_line_graph(
+            block_plot = self.plot_series(
+                bootstrap_axes,
                 x_values=range(bs_index, bs_index+len(block_sample)),
                 y_values=list(block_sample), 
                 line_color=RED,
@@ -420,17 +578,39 @@ class MBB(Scene):
             self.play(ReplacementTransform(block_label_with_length, block_label_mutated), FadeOut(arrow), FadeOut(arrow_label), FadeOut(dot_label))
             self.play(ReplacementTransform(fin_block.copy(), block_plot))
             self.play(FadeOut(fin_block), FadeOut(block_label_mutated))
+            self.flush_batch()
             bs_index += len(block_sample)
             i += 1
 
+        #past ANIMATED_BLOCKS the rest of the sample is resampled without
+        #animating each block and drawn as one line below
+        rest_index = bs_index
+        while bs_index < self.LENGTH:
+            block_sample = self.gen_block(np.random.randint(0, len(self.data)))
+            blocks.append(block_sample)
+            bs_index += len(block_sample)
+
         #combine the arrays in blocks into one numpy array
-        bootstrap_sample = np.concatenate(blocks)
-        print("=====================================") ### testing purposes
-        print(len(bootstrap_sample)) ### testing purposes
+        with self.metrics.timer("gather"):
+            bootstrap_sample = np.concatenate(blocks)
+        self.metrics.count("bytes_allocated", bootstrap_sample.nbytes)
+        #the last block is cut off if it runs past the length of the sample
+        if len(bootstrap_sample) > self.LENGTH:
+            self.metrics.count("truncated_blocks")
         bootstrap_sample = bootstrap_sample[:self.LENGTH]
-        print(len(bootstrap_sample)) ### testing purposes
+        if rest_index < self.LENGTH:
+            rest_plot = self.plot_series(
+                bootstrap_axes,
+                x_values=range(rest_index, self.LENGTH),
+                y_values=bootstrap_sample[rest_index:],
+                line_color=RED,
+                vertex_dot_radius=0.05,
+            )
+            block_plots.add(rest_plot)
+            self.play(*create_plot(rest_plot))
         #plot the final bootstrap sample
-        fin_bootstrap_plot = bootstrap_axes.plot_line_graph(
+        fin_bootstrap_plot = self.plot_series(
+            bootstrap_axes,
             x_values=range(self.LENGTH),
             y_values=bootstrap_sample, 
             line_color=GREEN,
@@ -438,11 +618,11 @@ class MBB(Scene):
         )
         
         final_plot = VGroup(bootstrap_axes, fin_bootstrap_plot)
-        self.play(Create(fin_bootstrap_plot["line_graph"]), *[Create(dot) for dot in fin_bootstrap_plot['vertex_dots']])
+        self.play(*create_plot(fin_bootstrap_plot))
         self.play(FadeOut(block_plots))
 
         #make final text objects
-        final_text = Tex("$\Rightarrow X^*_1, \ldots, X^*_{100}$").next_to(bootstrap_axes, RIGHT, buff=2)
+        final_text = Tex(f"$\Rightarrow X^*_1, \ldots, X^*_{{{self.LENGTH}}}$").next_to(bootstrap_axes, RIGHT, buff=2)
         self.play(Create(final_text))
 
         #center the final plot on the screen and scale it up
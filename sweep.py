@@ -0,0 +1,96 @@
+#renders a grid of configurations of the STBS or MBB scene across a process
+#pool. every configuration is a subclass of the scene with the given class
+#attributes and gets its own video, named after a hash of the scene and its
+#parameters, so configurations that were already rendered are skipped
+#
+#    python sweep.py STBS --param PROB=.03,.06,.1 --param LENGTH=100,200 --workers 8
+import argparse
+import ast
+import hashlib
+import itertools
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+
+#content hash of a configuration, used as its output file name
+def config_hash(scene_name, params, quality):
+    key = json.dumps({"scene": scene_name, "params": params, "quality": quality}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+#renders one configuration into out_dir/<name>.mp4 next to a json file with its
+#parameters. runs in a worker process, which is why manim is imported here
+def render_config(scene_name, params, quality, out_dir, name):
+    from manim import tempconfig
+
+    import stbs
+
+    #a unique class name also keeps the partial movie files of parallel renders
+    #apart, and a media_dir of its own keeps them from compiling the same Tex
+    #strings into the same files at the same time
+    scene_cls = type(name, (getattr(stbs, scene_name),), params)
+    media_dir = os.path.join(out_dir, "media", name)
+    with tempconfig({"quality": quality, "media_dir": media_dir, "video_dir": out_dir, "output_file": name, "disable_caching": True}):
+        scene_cls().render()
+    shutil.rmtree(media_dir, ignore_errors=True)
+    with open(os.path.join(out_dir, f"{name}.json"), "w") as f:
+        json.dump({"scene": scene_name, "params": params, "quality": quality}, f, indent=1)
+    return os.path.join(out_dir, f"{name}.mp4")
+
+
+#renders every combination of the values in grid, a dict of scene class
+#attribute -> list of values, with up to workers renders at a time. returns the
+#video of every configuration, rendered now or found from an earlier sweep
+def render_sweep(scene_name, grid, out_dir="sweep", workers=None, quality="low_quality"):
+    import stbs
+
+    #checked here so a typo fails before any render starts
+    base = getattr(stbs, scene_name)
+    unknown = [key for key in grid if not hasattr(base, key)]
+    if unknown:
+        raise ValueError(f"{scene_name} has no parameters {unknown}")
+
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    configs = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+    videos, jobs = [], []
+    for params in configs:
+        name = f"{scene_name}_{config_hash(scene_name, params, quality)}"
+        video = os.path.join(out_dir, f"{name}.mp4")
+        videos.append(video)
+        if not os.path.exists(video):
+            jobs.append((scene_name, params, quality, out_dir, name))
+
+    with ProcessPoolExecutor(workers) as pool:
+        for video in pool.map(render_config, *zip(*jobs)) if jobs else []:
+            print(f"rendered {video}")
+    print(f"{len(jobs)} rendered, {len(configs) - len(jobs)} skipped")
+    return videos
+
+
+#NAME=v1,v2,... with every value a python literal
+def parse_param(text):
+    name, _, values = text.partition("=")
+    if not name or not values:
+        raise argparse.ArgumentTypeError(f"expected NAME=v1,v2,..., got {text!r}")
+    return name, [ast.literal_eval(value) for value in values.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="render a parameter sweep of a bootstrap scene")
+    parser.add_argument("scene", choices=["STBS", "MBB"])
+    parser.add_argument("--param", type=parse_param, action="append", default=[],
+                        help="scene class attribute and the values to sweep, e.g. PROB=.03,.06")
+    parser.add_argument("--out", default="sweep", help="directory for the videos")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--quality", default="low_quality",
+                        choices=["low_quality", "medium_quality", "high_quality", "production_quality", "fourk_quality"])
+    args = parser.parse_args(argv)
+    render_sweep(args.scene, dict(args.param), args.out, args.workers, args.quality)
+
+
+if __name__ == "__main__":
+    main()
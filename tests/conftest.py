@@ -0,0 +1,5 @@
+import os
+import sys
+
+#bootstrap.py sits at the top of the repository, as for benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
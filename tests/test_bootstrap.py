@@ -0,0 +1,223 @@
+import functools
+
+import numpy as np
+import pytest
+
+import bootstrap
+from bootstrap import moving_block, stationary_block
+
+
+#a replicate built like the block loops of the scenes: blocks of X for the
+#given starts and lengths one after the other, cut to the length of X
+def loop_replicate(block, X, starts, lengths):
+    blocks, filled = [], 0
+    for I, L in zip(starts, lengths):
+        if filled >= len(X):
+            break
+        blocks.append(block(X, I, L))
+        filled += len(blocks[-1])
+    return np.concatenate(blocks)[:len(X)]
+
+
+@pytest.fixture
+def series():
+    return np.random.default_rng(0).standard_normal(500)
+
+
+@pytest.mark.parametrize("p", [.5, .06, .01])
+def test_stationary_plan_matches_block_loop(series, p):
+    n = len(series)
+    I, L = bootstrap._draw_stationary(n, p, 50, np.random.default_rng(1))
+    samples = bootstrap._plan_from_blocks(I, L, n).materialize(series)
+    for k in range(50):
+        np.testing.assert_array_equal(samples[k], loop_replicate(stationary_block, series, I[k], L[k]))
+
+
+@pytest.mark.parametrize("b", [1, 7, 50, 500])
+def test_moving_block_bootstrap_matches_block_loop(series, b):
+    n = len(series)
+    samples = bootstrap.moving_block_bootstrap(series, b, 50, rng=2)
+    I = np.random.default_rng(2).integers(0, n - b + 1, size=(50, -(-n // b)))
+    for k in range(50):
+        np.testing.assert_array_equal(samples[k], loop_replicate(moving_block, series, I[k], [b] * I.shape[1]))
+    np.testing.assert_array_equal(bootstrap.moving_block_plan(n, b, 50, rng=2).materialize(series), samples)
+
+
+def test_truncated_moving_block_plan_matches_block_loop(series):
+    n, b = len(series), 30
+    I = np.random.default_rng(3).integers(0, n, size=(50, 3 * n // b))
+    samples = bootstrap._plan_from_blocks(I, np.minimum(b, n - I), n, drawn=b).materialize(series)
+    for k in range(50):
+        np.testing.assert_array_equal(samples[k], loop_replicate(moving_block, series, I[k], [b] * I.shape[1]))
+
+
+def test_panel_shares_blocks_across_columns(series):
+    panel = np.column_stack((series, 2 * series))
+    samples = bootstrap.stationary_bootstrap(panel, .1, 20, rng=4)
+    assert samples.shape == (20, len(series), 2)
+    np.testing.assert_array_equal(samples[..., 1], 2 * samples[..., 0])
+
+
+@pytest.mark.parametrize("plan_fn", [
+    functools.partial(bootstrap.stationary_plan, 500, .05),
+    functools.partial(bootstrap.moving_block_plan, 500, 20),
+    functools.partial(bootstrap.moving_block_plan, 500, 20, truncate=True),
+])
+def test_prefix_moments_match_materialized(series, plan_fn):
+    panel = np.column_stack((series, series ** 2 + 10))
+    plan = plan_fn(100, np.random.default_rng(5))
+    samples = plan.materialize(panel)
+    mean, var = bootstrap.PrefixSums(panel, chunk_size=64).moments(plan)
+    np.testing.assert_allclose(mean, samples.mean(axis=1))
+    np.testing.assert_allclose(var, samples.var(axis=1))
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_parallel_results_do_not_depend_on_workers(series, executor):
+    plan_fn = functools.partial(bootstrap.stationary_plan, len(series), .05)
+    one = bootstrap.parallel_bootstrap(series, plan_fn, 1500, seed=6, workers=1, executor="thread")
+    many = bootstrap.parallel_bootstrap(series, plan_fn, 1500, seed=6, workers=3, batch_size=100, executor=executor)
+    np.testing.assert_array_equal(one, many)
+    replicate = bootstrap.replicate_plans(plan_fn, len(series), 6, 1234, 1235)
+    assert replicate.materialize(series).mean() == pytest.approx(one[1234])
+
+
+def test_plans_round_trip_through_files(series, tmp_path):
+    n = len(series)
+    plan_fn = functools.partial(bootstrap.moving_block_plan, n, 30, truncate=True)
+    expected = bootstrap.replicate_plans(plan_fn, n, 7, 0, 300).materialize(series)
+
+    bootstrap.save_plans(tmp_path / "plans.bin", n, plan_fn, 300, 7)
+    plan = bootstrap.load_plans(tmp_path / "plans.bin", n, chunk_size=100)
+    np.testing.assert_array_equal(plan.materialize(series), expected)
+
+    #replicates longer than a chunk are written chunk by chunk, whole groups at once otherwise
+    for chunk_size in [64, 1 << 20]:
+        out = bootstrap.bootstrap_to_file(tmp_path / "out.npy", series, plan_fn, 300, 7, chunk_size=chunk_size)
+        np.testing.assert_array_equal(out, expected)
+
+    bootstrap.save_plans(tmp_path / "empty.bin", n, plan_fn, 0, 7)
+    assert len(bootstrap.load_plans(tmp_path / "empty.bin", n)) == 0
+
+
+def test_closed_form_variances_match_monte_carlo(series):
+    n = len(series)
+    mean, _ = bootstrap.streaming_moments(series, functools.partial(bootstrap.stationary_plan, n, .05), 20000, rng=8)
+    assert bootstrap.stationary_mean_variance(series, .05) == pytest.approx(mean.var(), rel=.05)
+    mean, _ = bootstrap.streaming_moments(series, functools.partial(bootstrap.moving_block_plan, n, 30), 20000, rng=8)
+    assert bootstrap.moving_block_mean_variance(series, 30) == pytest.approx(mean.var(), rel=.05)
+
+
+def test_constant_column_gets_unit_block_length(series):
+    b, p = bootstrap.optimal_block_length(np.column_stack((series, np.full(len(series), 1 / 3))))
+    assert b[1] == 1 and p[1] == 1
+
+
+def test_short_series_gets_unit_block_length():
+    assert bootstrap.optimal_block_length(np.arange(3.0)) == (1, 1.0)
+    b, p = bootstrap.optimal_block_length(np.ones((5, 2)))
+    np.testing.assert_array_equal(b, [1, 1])
+    np.testing.assert_array_equal(p, [1, 1])
+
+
+def test_adaptive_bootstrap_stops_at_tolerance(series):
+    plan_fn = functools.partial(bootstrap.stationary_plan, len(series), .05)
+    result = bootstrap.adaptive_bootstrap(series, plan_fn, 2e-3, seed=9, batch_size=256)
+    assert result.converged and result.mc_error <= 2e-3
+    assert result.replicates == len(result.statistics) < 10**6
+    assert result.estimate == pytest.approx(result.statistics.std(ddof=1))
+    #the replicates used are the first ones of a fixed-size run
+    full = bootstrap.parallel_bootstrap(series, plan_fn, result.replicates, seed=9, executor="thread")
+    np.testing.assert_allclose(result.statistics, full)
+
+
+def test_adaptive_bootstrap_quantiles(series):
+    plan_fn = functools.partial(bootstrap.moving_block_plan, len(series), 20)
+    result = bootstrap.adaptive_bootstrap(series, plan_fn, 5e-3, quantiles=[.05, .95], seed=9)
+    assert result.converged and np.all(result.mc_error <= 5e-3)
+    np.testing.assert_allclose(result.estimate, np.quantile(result.statistics, [.05, .95]))
+
+
+def test_adaptive_bootstrap_reports_when_it_does_not_converge(series):
+    plan_fn = functools.partial(bootstrap.stationary_plan, len(series), .05)
+    result = bootstrap.adaptive_bootstrap(series, plan_fn, 1e-9, seed=9, batch_size=1000, max_replicates=2500)
+    assert not result.converged and result.replicates == 2500
+
+
+def test_adaptive_bootstrap_converges_without_spread():
+    plan_fn = functools.partial(bootstrap.stationary_plan, 100, .1)
+    result = bootstrap.adaptive_bootstrap(np.ones(100), plan_fn, 1e-3, seed=9, batch_size=256)
+    assert result.converged and result.replicates == 256 and result.mc_error == 0
+
+
+def test_quantile_sketch_rank_error():
+    values = np.random.default_rng(10).standard_normal(100000)
+    sketch = bootstrap.QuantileSketch()
+    for batch in np.array_split(values, 37):
+        sketch.update(batch)
+    assert sketch.count == len(values)
+    assert sum(map(len, sketch.levels)) < 1000
+    q = np.linspace(.01, .99, 50)
+    #the rank of each approximate quantile is within a few percent of q
+    ranks = np.searchsorted(np.sort(values), sketch.quantile(q)) / len(values)
+    assert np.abs(ranks - q).max() < .03
+    assert np.abs(sketch.rank(np.quantile(values, q)) - q).max() < .03
+
+
+def test_quantile_sketch_merge_matches_single_sketch():
+    values = np.random.default_rng(11).standard_normal(50000)
+    whole = bootstrap.QuantileSketch(seed=1)
+    whole.update(values)
+    merged = bootstrap.QuantileSketch(seed=1)
+    for i, part in enumerate(np.array_split(values, 5)):
+        sketch = bootstrap.QuantileSketch(seed=i)
+        sketch.update(part)
+        merged.merge(sketch)
+    assert merged.count == whole.count
+    q = np.linspace(.05, .95, 19)
+    np.testing.assert_allclose(merged.quantile(q), whole.quantile(q), atol=.1)
+
+    with pytest.raises(ValueError):
+        merged.merge(bootstrap.QuantileSketch(k=100))
+
+
+def test_quantile_sketch_errors(series):
+    sketch = bootstrap.QuantileSketch()
+    with pytest.raises(ValueError):
+        sketch.quantile(.5)
+    with pytest.raises(ValueError):
+        sketch.rank(0)
+    with pytest.raises(ValueError):
+        sketch.update(np.zeros((10, 2)))
+    panel = np.column_stack((series, series + 100))
+    plan_fn = functools.partial(bootstrap.stationary_plan, len(series), .05)
+    with pytest.raises(ValueError):
+        bootstrap.parallel_bootstrap(panel, plan_fn, 100, seed=0, executor="thread", sketch=sketch)
+
+
+def test_metrics_record_and_merge():
+    metrics = bootstrap.Metrics()
+    with metrics.timer("index"):
+        pass
+    metrics.count("blocks", 3)
+    metrics.count("blocks")
+    other = bootstrap.Metrics()
+    other.count("blocks", 6)
+    other.count("wrapped_blocks", 2)
+    with other.timer("gather"):
+        pass
+    report = metrics.merge(other).report()
+    assert report["counts"] == {"blocks": 10, "wrapped_blocks": 2}
+    assert set(report["times"]) == {"index", "gather"}
+    assert not bootstrap.NO_METRICS.enabled
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_parallel_bootstrap_collects_metrics(series, executor):
+    plan_fn = functools.partial(bootstrap.stationary_plan, len(series), .05)
+    metrics = bootstrap.Metrics()
+    bootstrap.parallel_bootstrap(series, plan_fn, 1024, seed=12, workers=2, batch_size=256, executor=executor, metrics=metrics)
+    plan = bootstrap.replicate_plans(plan_fn, len(series), 12, 0, 1024)
+    assert metrics.counts["blocks"] == len(plan.starts)
+    assert metrics.counts["bytes_allocated"] > 0
+    assert {"index", "statistic"} <= set(metrics.times)
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+#the scenes import manim at module level
+stbs = pytest.importorskip("stbs", exc_type=ImportError)
+
+
+def test_decimate_keeps_extremes_of_each_bucket():
+    y = np.random.default_rng(0).standard_normal(1000)
+    x = np.arange(1000)
+    dx, dy = stbs.decimate(x, y, 100)
+    assert len(dy) <= 100
+    assert np.all(np.diff(dx) > 0)
+    np.testing.assert_array_equal(dy, y[dx])
+    for lo, hi in zip(range(0, 1000, 20), range(20, 1020, 20)):
+        kept = dy[(dx >= lo) & (dx < hi)]
+        assert kept.min() == y[lo:hi].min() and kept.max() == y[lo:hi].max()
+
+
+def test_decimate_leaves_short_lines_alone():
+    x, y = np.arange(10), np.arange(10.0) ** 2
+    dx, dy = stbs.decimate(x, y, 10)
+    np.testing.assert_array_equal(dx, x)
+    np.testing.assert_array_equal(dy, y)
+
+
+def test_decimate_needs_two_points():
+    with pytest.raises(ValueError):
+        stbs.decimate(np.arange(10), np.arange(10.0), 1)
@@ -0,0 +1,27 @@
+import argparse
+
+import pytest
+
+import sweep
+
+
+def test_config_hash_names_configurations():
+    name = sweep.config_hash("STBS", {"PROB": .06, "LENGTH": 100}, "low_quality")
+    assert len(name) == 16
+    #the order of the parameters does not matter, their values and the quality do
+    assert name == sweep.config_hash("STBS", {"LENGTH": 100, "PROB": .06}, "low_quality")
+    assert name != sweep.config_hash("STBS", {"PROB": .1, "LENGTH": 100}, "low_quality")
+    assert name != sweep.config_hash("MBB", {"PROB": .06, "LENGTH": 100}, "low_quality")
+    assert name != sweep.config_hash("STBS", {"PROB": .06, "LENGTH": 100}, "high_quality")
+
+
+def test_parse_param_reads_literals():
+    assert sweep.parse_param("PROB=.03,.06") == ("PROB", [.03, .06])
+    assert sweep.parse_param("LENGTH=100") == ("LENGTH", [100])
+    assert sweep.parse_param("PREVIEW=True,False") == ("PREVIEW", [True, False])
+
+
+@pytest.mark.parametrize("text", ["PROB", "=.06", "PROB="])
+def test_parse_param_rejects_malformed(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        sweep.parse_param(text)